@@ -80,6 +80,22 @@ class SqliteHelper:
             self.logger.error(f"Fetch error: {e}")
             raise
 
+    def iterate(self, query, params=None):
+        """Yield rows one at a time instead of loading the whole result."""
+        try:
+            if not self.conn:
+                self.connect()
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(query, params or ())
+                for row in cursor:
+                    yield row
+            finally:
+                cursor.close()
+        except sqlite3.Error as e:
+            self.logger.error(f"Fetch error: {e}")
+            raise
+
     def __enter__(self):
         self.connect()
         return self
@@ -97,6 +113,21 @@ class SqliteHelper:
                 )
             """)
             self.logger.info("Table xe_gui created or already exists")
+            self.execute("""
+                CREATE TABLE IF NOT EXISTS export_watermark(
+                    destination TEXT PRIMARY KEY,
+                    last_id INTEGER NOT NULL,
+                    pending_first INTEGER
+                )
+            """)
+            self.logger.info("Table export_watermark created or already exists")
+            self.execute("""
+                CREATE TABLE IF NOT EXISTS export_settings(
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            """)
+            self.logger.info("Table export_settings created or already exists")
         except sqlite3.Error as e:
             self.logger.error(f"Error creating table: {e}")
             raise
@@ -124,8 +155,22 @@ class SqliteHelper:
             raise
 
 
-# Create a singleton instance
-db = SqliteHelper()
+# Shared instance for the default database, opened on first use so that
+# importing the class alone does not create resources/gui_xe.db
+_db = None
+
+
+def get_db():
+    global _db
+    if _db is None:
+        _db = SqliteHelper()
+    return _db
+
+
+def __getattr__(name):
+    if name == 'db':
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 #test.edit("INSERT INTO xe_gui (so_xe) VALUES ('XXXXX-XXXX')")
 #test.edit("UPDATE users SET name='jack' WHERE name = 'john'")
@@ -19,4 +19,8 @@ TITLE_FONT_SIZE = 28
 
 # Ticket Settings
 TICKET_TITLE = "GAMING PARKING"
-TICKET_SUBTITLE = "GIỮ XE MIỄN PHÍ" 
\ No newline at end of file
+TICKET_SUBTITLE = "GIỮ XE MIỄN PHÍ" 
+
+# Export Settings
+EXPORT_CHUNK_SIZE = 8 * 1024 * 1024  # uncompressed bytes per .csv.gz chunk
+EXPORT_FILE_PREFIX = "xe_gui"
@@ -21,6 +21,7 @@ from PyQt5.QtWidgets import QInputDialog, QDialog, QProgressDialog, QProgressBar
 
 from SqliteHelper import db
 from config import FONT_FAMILY, FONT_SIZE, TICKET_TITLE, TICKET_SUBTITLE
+from incremental_export import export_incremental
 from xuat_baocao import Ui_Dialog
 
 # Global font settings
@@ -214,6 +215,11 @@ class Ui_MainWindow:
         self.pushButton_2.setObjectName("pushButton_2")
         self.pushButton_2.clicked.connect(self.openExportCsvDialog)
         
+        self.pushButton_3 = QtWidgets.QPushButton(self.centralwidget)
+        self.pushButton_3.setGeometry(QtCore.QRect(525, 53, 101, 20))
+        self.pushButton_3.setObjectName("pushButton_3")
+        self.pushButton_3.clicked.connect(self.exportIncremental)
+        
         # Create table
         self.tableWidget = QtWidgets.QTableWidget(self.centralwidget)
         self.tableWidget.setGeometry(QtCore.QRect(20, 81, 1081, 481))
@@ -259,6 +265,7 @@ class Ui_MainWindow:
         self.pushButton.setDefault(True)
         self.pushButton.setAutoDefault(False)
         self.pushButton_2.setText(_translate("MainWindow", ">>>"))
+        self.pushButton_3.setText(_translate("MainWindow", "Xuất mới"))
 
     def printInstant(self) -> None:
         """Handle instant print action."""
@@ -359,6 +366,23 @@ class Ui_MainWindow:
         except Exception as e:
             self.show_error("Lỗi", f"Không thể xuất báo cáo: {str(e)}")
 
+    def exportIncremental(self) -> None:
+        """Export rows added since the last export to the chosen folder."""
+        try:
+            folder = QtWidgets.QFileDialog.getExistingDirectory(None, 'Xuất dữ liệu mới')
+            if not folder:
+                return
+
+            paths = export_incremental(folder)
+            if not paths:
+                self.show_warning("Không có dữ liệu", "Không có dữ liệu mới kể từ lần xuất trước.")
+                return
+
+            self.show_info("Thành công", f"Đã xuất {len(paths)} file vào thư mục: {folder}")
+
+        except Exception as e:
+            self.show_error("Lỗi", f"Không thể xuất dữ liệu mới: {str(e)}")
+
     def show_error(self, title: str, message: str) -> None:
         """Show error message."""
         msg = QMessageBox()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Incremental CSV export.
+
+Streams xe_gui rows newer than the last exported id into gzip-compressed
+CSV chunks named ``xe_gui_<gate>_<first id>_<last id>.csv.gz``. The gate
+id is generated once per database, so several gates can share one
+destination folder without their files colliding.
+
+The last exported id is remembered per destination directory, so every
+run only writes new rows. Before a chunk is started its first id is
+recorded as pending; the chunk is written to a ``.part`` file, fsynced
+and renamed, and only then does the watermark move and the pending mark
+clear. A run that finds a pending mark deletes this gate's files from
+that id on and rewrites them, so a crash never leaves rows in two files.
+Runs against the same destination are serialised with a lock file.
+
+Chunk names and gzip headers depend only on the rows, so re-runs are
+byte-identical.
+
+Usage:
+    python src/incremental_export.py DEST_DIR [--since ID] [--chunk-size BYTES] [--db PATH]
+"""
+
+from typing import Iterator, List, Optional, Tuple
+import argparse
+import contextlib
+import csv
+import gzip
+import io
+import os
+import re
+import sqlite3
+import sys
+import uuid
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+from SqliteHelper import SqliteHelper, get_db
+from config import EXPORT_CHUNK_SIZE, EXPORT_FILE_PREFIX
+
+CSV_HEADER = ['ID', 'Số xe', 'Ngày tạo']
+
+
+def get_gate_id(helper: SqliteHelper) -> str:
+    """Return this database's gate id, creating it on first use."""
+    row = helper.fetch_one("SELECT value FROM export_settings WHERE name = 'gate_id'")
+    if row:
+        return row[0]
+    gate = uuid.uuid4().hex[:8]
+    helper.execute(
+        "INSERT INTO export_settings (name, value) VALUES ('gate_id', ?)",
+        (gate,)
+    )
+    return gate
+
+
+def get_watermark(helper: SqliteHelper, destination: str) -> int:
+    """Return the last exported id for a destination, 0 if none."""
+    row = helper.fetch_one(
+        "SELECT last_id FROM export_watermark WHERE destination = ?",
+        (destination,)
+    )
+    return row[0] if row else 0
+
+
+def get_pending(helper: SqliteHelper, destination: str) -> Optional[int]:
+    """Return the first id of an unfinished chunk for a destination, if any."""
+    row = helper.fetch_one(
+        "SELECT pending_first FROM export_watermark WHERE destination = ?",
+        (destination,)
+    )
+    return row[0] if row else None
+
+
+def set_pending(helper: SqliteHelper, destination: str, last_id: int, first_id: int) -> None:
+    """Record that files from first_id on are not yet covered by the watermark."""
+    helper.execute(
+        "INSERT OR REPLACE INTO export_watermark (destination, last_id, pending_first) "
+        "VALUES (?, ?, ?)",
+        (destination, last_id, first_id)
+    )
+
+
+def set_watermark(helper: SqliteHelper, destination: str, last_id: int) -> None:
+    """Store the last exported id for a destination and clear the pending mark."""
+    helper.execute(
+        "INSERT OR REPLACE INTO export_watermark (destination, last_id, pending_first) "
+        "VALUES (?, ?, NULL)",
+        (destination, last_id)
+    )
+
+
+def _csv_line(row) -> bytes:
+    """Encode a single row exactly as csv.writer would write it."""
+    buf = io.StringIO()
+    csv.writer(buf).writerow(row)
+    return buf.getvalue().encode('utf-8')
+
+
+def _fsync_dir(path: str) -> None:
+    """Make a rename in path durable; Windows has no directory fsync."""
+    if os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _Chunk:
+    """A gzip CSV file being written under a temporary ``.part`` name."""
+
+    def __init__(self, destination: str, gate: str, first_id: int):
+        self.destination = destination
+        self.prefix = f"{EXPORT_FILE_PREFIX}_{gate}"
+        self.first_id = first_id
+        self.last_id = first_id
+        self.size = 0
+        self.part_path = _part_path(destination, gate, first_id)
+        self.raw = open(self.part_path, 'wb')
+        # Empty filename and fixed mtime keep the gzip header deterministic
+        self.gz = gzip.GzipFile(filename='', mode='wb', fileobj=self.raw, mtime=0)
+        self.write(CSV_HEADER)
+
+    def write(self, row) -> None:
+        data = _csv_line(row)
+        self.gz.write(data)
+        self.size += len(data)
+
+    def add(self, row) -> None:
+        self.write(row)
+        self.last_id = row[0]
+
+    def finish(self) -> str:
+        """Flush to disk and move the chunk to its final name."""
+        try:
+            self.gz.close()
+            self.raw.flush()
+            os.fsync(self.raw.fileno())
+        finally:
+            self.raw.close()
+        path = os.path.join(
+            self.destination,
+            f"{self.prefix}_{self.first_id:010d}_{self.last_id:010d}.csv.gz"
+        )
+        os.replace(self.part_path, path)
+        _fsync_dir(self.destination)
+        return path
+
+    def discard(self) -> None:
+        try:
+            self.gz.close()
+        finally:
+            self.raw.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.part_path)
+
+
+def _part_path(destination: str, gate: str, first_id: int) -> str:
+    return os.path.join(destination, f"{EXPORT_FILE_PREFIX}_{gate}_{first_id:010d}.csv.gz.part")
+
+
+def _gate_files(destination: str, gate: str) -> Iterator[Tuple[int, int, str]]:
+    """Yield (first id, last id, name) for this gate's finished chunks."""
+    pattern = re.compile(
+        re.escape(f"{EXPORT_FILE_PREFIX}_{gate}_") + r'(\d{10})_(\d{10})\.csv\.gz$'
+    )
+    for name in sorted(os.listdir(destination)):
+        match = pattern.match(name)
+        if match:
+            yield int(match.group(1)), int(match.group(2)), name
+
+
+def _remove_from(destination: str, gate: str, first_id: int) -> None:
+    """Delete this gate's chunks and .part files starting at first_id or later."""
+    for first, _, name in list(_gate_files(destination, gate)):
+        if first >= first_id:
+            os.remove(os.path.join(destination, name))
+    prefix = f"{EXPORT_FILE_PREFIX}_{gate}_"
+    for name in os.listdir(destination):
+        if name.startswith(prefix) and name.endswith('.csv.gz.part'):
+            if int(name[len(prefix):-len('.csv.gz.part')]) >= first_id:
+                os.remove(os.path.join(destination, name))
+
+
+def _watermark_key(destination: str) -> str:
+    """Normalise a destination so every spelling of a folder shares one watermark."""
+    return os.path.normcase(os.path.realpath(destination))
+
+
+@contextlib.contextmanager
+def _destination_lock(destination: str, gate: str):
+    """Hold an exclusive OS lock on this gate's lock file in the destination."""
+    path = os.path.join(destination, f"{EXPORT_FILE_PREFIX}_{gate}.lock")
+    fd = os.open(path, os.O_RDWR | os.O_CREAT)
+    try:
+        try:
+            if os.name == 'nt':
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            raise BlockingIOError(f"Another export to {destination} is already running")
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def export_incremental(destination: str,
+                       since: Optional[int] = None,
+                       chunk_size: int = EXPORT_CHUNK_SIZE,
+                       helper: Optional[SqliteHelper] = None) -> List[str]:
+    """
+    Export rows newer than the destination's watermark.
+
+    With ``since``, this gate's files after that id are deleted and
+    rewritten from ``since``; it must not fall inside an existing chunk.
+    Returns the paths of the chunk files written, in id order.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if helper is None:
+        helper = get_db()
+
+    destination = os.path.realpath(destination)
+    os.makedirs(destination, exist_ok=True)
+    key = _watermark_key(destination)
+    gate = get_gate_id(helper)
+
+    written = []
+    with _destination_lock(destination, gate):
+        last_id = get_watermark(helper, key)
+        pending = get_pending(helper, key)
+
+        if since is not None:
+            for first, last, name in _gate_files(destination, gate):
+                if pending is not None and first >= pending:
+                    continue
+                if first <= since < last:
+                    raise ValueError(
+                        f"since={since} falls inside {name}; use {first - 1} or {last}"
+                    )
+            last_id, pending = since, since + 1
+            set_pending(helper, key, last_id, pending)
+
+        # Files from an interrupted run are rewritten from the watermark
+        if pending is not None:
+            _remove_from(destination, gate, pending)
+
+        chunk = None
+        try:
+            rows = helper.iterate(
+                "SELECT id, so_xe, ngay_tao FROM xe_gui WHERE id > ? ORDER BY id",
+                (last_id,)
+            )
+            for row in rows:
+                if chunk is None:
+                    set_pending(helper, key, last_id, row[0])
+                    chunk = _Chunk(destination, gate, row[0])
+                chunk.add(row)
+                if chunk.size >= chunk_size:
+                    written.append(chunk.finish())
+                    last_id, chunk = chunk.last_id, None
+                    set_watermark(helper, key, last_id)
+            if chunk is not None:
+                written.append(chunk.finish())
+                last_id, chunk = chunk.last_id, None
+                set_watermark(helper, key, last_id)
+            if pending is not None and not written:
+                set_watermark(helper, key, last_id)
+        finally:
+            if chunk is not None:
+                chunk.discard()
+
+    helper.logger.info(f"Exported {len(written)} chunk(s) to {destination}")
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for scheduled exports."""
+    parser = argparse.ArgumentParser(description="Incremental gzip CSV export of xe_gui.")
+    parser.add_argument('destination', help="directory to write .csv.gz chunks into")
+    parser.add_argument('--since', type=int, default=None,
+                        help="delete this gate's files after this id and re-export from it")
+    parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                        help="uncompressed bytes per chunk before rotating (default: %(default)s)")
+    parser.add_argument('--db', default=None, help="path to an existing sqlite database")
+    args = parser.parse_args(argv)
+
+    if args.db and not os.path.isfile(args.db):
+        print(f"Export failed: database not found: {args.db}", file=sys.stderr)
+        return 1
+
+    helper = None
+    try:
+        helper = SqliteHelper(os.path.abspath(args.db)) if args.db else get_db()
+        paths = export_incremental(args.destination, args.since, args.chunk_size, helper)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if helper is not None:
+            helper.close()
+
+    for path in paths:
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
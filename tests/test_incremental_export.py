@@ -0,0 +1,180 @@
+import gzip
+import os
+import sqlite3
+
+import pytest
+
+import incremental_export
+from incremental_export import export_incremental, get_gate_id, get_watermark, main
+from SqliteHelper import SqliteHelper
+
+
+def add_rows(helper, count):
+    for i in range(count):
+        helper.execute(
+            "INSERT INTO xe_gui (so_xe, ngay_tao) VALUES (?, '2024-01-01 08:00:00')",
+            (f"Xe {i}",)
+        )
+
+
+def read_rows(paths):
+    rows = []
+    for path in paths:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        assert lines[0] == 'ID,Số xe,Ngày tạo'
+        rows.extend(int(line.split(',')[0]) for line in lines[1:])
+    return rows
+
+
+def chunk_files(folder):
+    return sorted(name for name in os.listdir(folder) if name.endswith('.csv.gz'))
+
+
+def contents(folder):
+    result = {}
+    for name in chunk_files(folder):
+        with open(os.path.join(folder, name), 'rb') as f:
+            result[name] = f.read()
+    return result
+
+
+@pytest.fixture
+def helper(tmp_path):
+    h = SqliteHelper(str(tmp_path / 'gate.db'))
+    add_rows(h, 100)
+    yield h
+    h.close()
+
+
+def test_rotates_chunks_and_covers_every_row_once(helper, tmp_path):
+    out = tmp_path / 'out'
+    paths = export_incremental(str(out), chunk_size=500, helper=helper)
+
+    assert len(paths) > 1
+    assert read_rows(paths) == list(range(1, 101))
+    assert export_incremental(str(out), chunk_size=500, helper=helper) == []
+
+    add_rows(helper, 3)
+    new = export_incremental(str(out), chunk_size=500, helper=helper)
+    assert read_rows(new) == [101, 102, 103]
+
+
+def test_rerun_is_byte_identical(helper, tmp_path):
+    out = tmp_path / 'out'
+    export_incremental(str(out), chunk_size=500, helper=helper)
+    first = contents(out)
+
+    export_incremental(str(out), since=0, chunk_size=500, helper=helper)
+    assert contents(out) == first
+
+
+def test_crash_between_rename_and_watermark(helper, tmp_path, monkeypatch):
+    out = tmp_path / 'out'
+    export_incremental(str(out), helper=helper)
+    add_rows(helper, 5)
+
+    def crash(*args):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(incremental_export, 'set_watermark', crash)
+    with pytest.raises(KeyboardInterrupt):
+        export_incremental(str(out), helper=helper)
+    monkeypatch.undo()
+
+    add_rows(helper, 5)
+    export_incremental(str(out), helper=helper)
+    paths = [os.path.join(out, name) for name in chunk_files(out)]
+    assert read_rows(paths) == list(range(1, 111))
+
+
+def test_crash_mid_chunk(helper, tmp_path, monkeypatch):
+    out = tmp_path / 'out'
+    expected = tmp_path / 'expected'
+    export_incremental(str(expected), chunk_size=500, helper=helper)
+
+    # A hard crash skips cleanup, leaving the .part file behind
+    def crash(self, row):
+        if row[0] == 50:
+            raise KeyboardInterrupt
+        self.write(row)
+        self.last_id = row[0]
+    monkeypatch.setattr(incremental_export._Chunk, 'add', crash)
+    monkeypatch.setattr(incremental_export._Chunk, 'discard', lambda self: self.raw.close())
+    with pytest.raises(KeyboardInterrupt):
+        export_incremental(str(out), chunk_size=500, helper=helper)
+    monkeypatch.undo()
+    assert any(name.endswith('.part') for name in os.listdir(out))
+
+    export_incremental(str(out), chunk_size=500, helper=helper)
+    assert not any(name.endswith('.part') for name in os.listdir(out))
+    assert contents(out) == contents(expected)
+
+
+def test_watermark_error_is_not_masked(helper, tmp_path, monkeypatch):
+    def locked(*args):
+        raise sqlite3.OperationalError('database is locked')
+    monkeypatch.setattr(incremental_export, 'set_watermark', locked)
+
+    with pytest.raises(sqlite3.OperationalError, match='locked'):
+        export_incremental(str(tmp_path / 'out'), helper=helper)
+
+
+def test_watermark_shared_across_path_spellings(helper, tmp_path):
+    out = tmp_path / 'out'
+    export_incremental(str(out), helper=helper)
+
+    other = os.path.join(str(tmp_path), '.', 'out', '..', 'out')
+    assert export_incremental(other, helper=helper) == []
+    assert get_watermark(helper, incremental_export._watermark_key(other)) == 100
+
+
+def test_gates_sharing_a_folder_keep_their_files(helper, tmp_path, monkeypatch):
+    out = tmp_path / 'out'
+    other = SqliteHelper(str(tmp_path / 'other.db'))
+    add_rows(other, 10)
+    assert get_gate_id(other) != get_gate_id(helper)
+
+    export_incremental(str(out), helper=other)
+    ours = export_incremental(str(out), helper=helper)
+    add_rows(helper, 5)
+
+    # Crash our second chunk after the rename; recovery must not touch the other gate
+    monkeypatch.setattr(incremental_export, 'set_watermark', lambda *args: None)
+    export_incremental(str(out), helper=helper)
+    monkeypatch.undo()
+    export_incremental(str(out), helper=helper)
+
+    def gate_files(h):
+        prefix = f"xe_gui_{get_gate_id(h)}_"
+        return [os.path.join(out, name) for name in chunk_files(out) if name.startswith(prefix)]
+
+    assert read_rows(gate_files(other)) == list(range(1, 11))
+    mine = gate_files(helper)
+    assert ours[0] in mine
+    assert read_rows(mine) == list(range(1, 106))
+    other.close()
+
+
+def test_since_inside_a_chunk_is_refused(helper, tmp_path):
+    out = tmp_path / 'out'
+    export_incremental(str(out), helper=helper)
+
+    with pytest.raises(ValueError, match='falls inside'):
+        export_incremental(str(out), since=50, helper=helper)
+    assert get_watermark(helper, incremental_export._watermark_key(str(out))) == 100
+
+
+def test_concurrent_export_is_refused(helper, tmp_path):
+    out = tmp_path / 'out'
+    os.makedirs(out)
+    with incremental_export._destination_lock(os.path.realpath(out), get_gate_id(helper)):
+        with pytest.raises(BlockingIOError):
+            export_incremental(str(out), helper=helper)
+    assert export_incremental(str(out), helper=helper)
+
+
+def test_cli_rejects_missing_database(tmp_path, capsys):
+    db_path = tmp_path / 'typo.db'
+    assert main([str(tmp_path / 'out'), '--db', str(db_path)]) == 1
+    assert not db_path.exists()
+    assert 'database not found' in capsys.readouterr().err